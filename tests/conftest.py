@@ -0,0 +1,22 @@
+"""Shared fixtures: the default parameters shipped in ymls/params.yml"""
+import pathlib
+
+import pytest
+import yaml
+
+import wlc.fitting
+
+PARAMS_YML = pathlib.Path(__file__).resolve().parent.parent/"ymls"/"params.yml"
+
+@pytest.fixture(scope="session")
+def params():
+    # Load the YAML file
+    with open(PARAMS_YML, 'r') as file:
+        return yaml.safe_load(file)
+
+@pytest.fixture(scope="session")
+def kBT(params):
+    # Same kBT as the fits compiled with these parameters
+    wlchain = wlc.fitting.WormLikeChain()
+    wlchain.compile(params)
+    return wlchain.kBT
@@ -0,0 +1,70 @@
+"""WormLikeChain.fit_many against fitting each FD curve with WormLikeChain.fit"""
+import numpy as np
+import pytest
+import scipy.optimize
+
+import wlc.fitting
+import wlc.models
+
+def synthetic_curve(model, seed, kBT):
+    """Noisy FD curve of the model with random Lc, Lp and S. Distance [um], force [pN]."""
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(80, 400))
+    Lc, Lp, S = rng.uniform(4500, 5400), rng.uniform(35, 70), rng.uniform(900, 1600)
+    if model in ("WLC", "bouchiat"):
+        d = np.linspace(0.2, rng.uniform(0.8, 0.9), n)*Lc/1000
+        F = getattr(wlc.models, model)(d, kBT, Lc, Lp) + rng.normal(scale=0.05, size=n)
+    elif model == "odijk":
+        F = np.linspace(rng.uniform(2, 6), rng.uniform(12, 40), n)
+        d = wlc.models.odijk(F, kBT, Lc, Lp, S) + rng.normal(scale=2e-3, size=n)
+    else:
+        # Invert the inextensible model for the relative extension, then stretch it
+        inextensible = wlc.models.WLC if model == "extWLC" else wlc.models.bouchiat
+        F = np.linspace(rng.uniform(0.5, 2), rng.uniform(12, 40), n)
+        x = [scipy.optimize.brentq(lambda x: inextensible(x*Lc/1000, kBT, Lc, Lp) - f, 1e-6, 1 - 1e-9) for f in F]
+        d = Lc*(np.array(x) + F/S)/1000 + rng.normal(scale=2e-3, size=n)
+    return d, F
+
+@pytest.mark.parametrize("model", ["WLC", "bouchiat", "odijk", "extWLC", "extbouchiat"])
+def test_fit_many_matches_fit(model, params, kBT):
+    dlist, Flist = zip(*[synthetic_curve(model, seed, kBT) for seed in range(40)])
+
+    wlchain = wlc.fitting.WormLikeChain(model)
+    wlchain.compile(params)
+    df_many = wlchain.fit_many(dlist, Flist)
+
+    expected = []
+    for d, F in zip(dlist, Flist):
+        single = wlc.fitting.WormLikeChain(model)
+        single.compile(params)
+        single.fit((d, F), params["min_delta"], params["max_iters"])
+        expected.append(single.df_full[['Lc[nm]', 'Lp[nm]', 'Chisqr']].values[-1])
+    expected = np.array(expected, dtype=np.float64)
+
+    # Never worse than fit, and the same optimum whenever both reach the same chi-square
+    assert df_many['converged'].all()
+    assert np.all(df_many['Chisqr'] <= expected[:, 2]*(1 + 1e-6))
+    same = np.isclose(df_many['Chisqr'], expected[:, 2], rtol=1e-3)
+    assert same.mean() >= 0.5
+    np.testing.assert_allclose(df_many['opt_Lp[nm]'][same], expected[same, 1], atol=10*params["min_delta"])
+    np.testing.assert_allclose(df_many['opt_Lc[nm]'][same], expected[same, 0], rtol=1e-3)
+
+def test_fit_many_filters_curves_at_bounds(capsys, params, kBT):
+    # Lp beyond its upper bound: the fit ends at the bound and is filtered out
+    d = np.linspace(1, 4.5, 200)
+    F = wlc.models.WLC(d, kBT, 5000, 300)
+    dlist, Flist = [d, d], [F, wlc.models.WLC(d, kBT, 5000, 50)]
+
+    wlchain = wlc.fitting.WormLikeChain("WLC")
+    wlchain.compile(params)
+    df_many = wlchain.fit_many(dlist, Flist, filenames=["stiff", "dna"])
+
+    assert np.isnan(df_many.loc[0, 'opt_Lp[nm]'])
+    assert df_many.loc[1, 'opt_Lp[nm]'] == pytest.approx(50, rel=1e-6)
+    assert "stiff" in capsys.readouterr().out
+
+    # fit uses the same check: every iteration on the stiff curve is filtered out
+    for F, expected_rows in zip(Flist, (0, 1)):
+        single = wlc.fitting.WormLikeChain("WLC")
+        single.compile(params)
+        assert len(single.fit((d, F), params["min_delta"], params["max_iters"])) == expected_rows
@@ -0,0 +1,35 @@
+"""Analytic Jacobians against central finite differences of the model kernels"""
+import numpy as np
+import pytest
+
+import wlc.jacobians
+import wlc.models
+
+KBT = 4.18
+D_NM = np.linspace(1, 5, 200)*1000
+F = np.linspace(5, 15, 200)
+
+# Model kernel, leading arguments and fitted parameters (Lc, Lp[, S])
+CASES = {"WLC" : (wlc.models._wlc_core, (D_NM, KBT), (5600.0, 53.0)),
+         "bouchiat" : (wlc.models._bouchiat_core, (D_NM, KBT), (5600.0, 53.0)),
+         "extWLC" : (wlc.models._extwlc_core, (D_NM, F, KBT), (5600.0, 53.0, 1255.0)),
+         "extbouchiat" : (wlc.models._extbouchiat_core, (D_NM, F, KBT), (5600.0, 53.0, 1255.0)),
+         "odijk" : (wlc.models._odijk_core, (F, KBT), (5600.0, 53.0, 1255.0))}
+
+@pytest.mark.parametrize("model", CASES)
+def test_jacobian_matches_finite_differences(model):
+    core, args, theta = CASES[model]
+    n, p = args[0].shape[0], len(theta)
+
+    def f(t):
+        return core(*args, *t, np.empty(n))
+
+    analytic = getattr(wlc.jacobians, model)(*args, *theta, np.empty((n, p)))
+
+    numeric = np.empty((n, p))
+    for k in range(p):
+        h = np.zeros(p)
+        h[k] = theta[k]*1e-6
+        numeric[:, k] = (f(np.add(theta, h)) - f(np.subtract(theta, h)))/(2*h[k])
+
+    np.testing.assert_allclose(analytic, numeric, rtol=1e-6, atol=1e-12)
@@ -0,0 +1,39 @@
+"""Compiled models against their closed-form expressions"""
+import lmfit
+import numpy as np
+import pytest
+
+import wlc.models
+
+KBT, LC, LP, S = 4.18, 5600.0, 53.0, 1255.0
+
+def ext_params():
+    fparams = lmfit.Parameters()
+    for name, value in (("kBT", KBT), ("Lc", LC), ("Lp", LP), ("S", S)):
+        fparams.add(name, value=value)
+    return fparams
+
+def extWLC_expected(F, d):
+    x = np.asarray(d)*1000/LC - np.asarray(F)/S
+    return (KBT/LP)*(0.25/(1 - x)**2 - 0.25 + x)
+
+@pytest.mark.parametrize("F, d", [(5.0, np.linspace(1, 5, 6)),
+                                  (np.linspace(1, 5, 6), 4.0),
+                                  (np.linspace(1, 5, 6)[:, None], np.linspace(1, 5, 3))])
+def test_ext_models_broadcast_force_and_distance(F, d):
+    expected = extWLC_expected(F, d)
+    got = wlc.models.extWLC(ext_params(), F, d)
+    assert np.shape(got) == expected.shape
+    np.testing.assert_allclose(got, expected, rtol=1e-12)
+    np.testing.assert_allclose(wlc.models.res_extWLC(ext_params(), F, d), F - expected, rtol=1e-9, atol=1e-12)
+    # Bouchiat's correction vanishes only at zero extension: check the broadcast shape
+    assert np.shape(wlc.models.extbouchiat(ext_params(), F, d)) == expected.shape
+
+def test_scalar_distance_gives_scalar_force():
+    got = wlc.models.WLC(2.0, KBT, LC, LP)
+    assert np.ndim(got) == 0
+    assert got == pytest.approx((KBT/LP)*(0.25/(1 - 2000/LC)**2 - 0.25 + 2000/LC), rel=1e-12)
+
+def test_array_parameters_are_rejected():
+    with pytest.raises(TypeError):
+        wlc.models.WLC(np.linspace(1, 4, 5), KBT, np.array([5600.0, 6000.0]), LP)
@@ -0,0 +1,39 @@
+"""Cluster priors for batch fits"""
+import numpy as np
+
+import wlc.fitting
+import wlc.models
+
+def wlc_curve(Lc, Lp, seed, kBT):
+    rng = np.random.default_rng(seed)
+    d = np.linspace(0.2, 0.85, 200)*Lc/1000
+    return d, wlc.models.WLC(d, kBT, Lc, Lp) + rng.normal(scale=0.01, size=d.size), f"curve{seed}"
+
+def test_priors_per_cluster(params, kBT):
+    # Three groups of curves with well separated contour lengths
+    truth = [(2000, 40), (5000, 50), (12000, 60)]
+    datasets = [wlc_curve(*truth[j % 3], seed=j, kBT=kBT) for j in range(12)]
+
+    labels, priors = wlc.fitting.precluster_and_prior(datasets, params, model="WLC", k=3)
+
+    # One cluster per group
+    assert len(set(labels)) == 3
+    for j in range(3):
+        assert np.all(labels[j::3] == labels[j])
+
+    # Priors from the fits of each group, as reported by fit
+    for j in range(3):
+        prior = priors[int(labels[j])]
+        assert set(prior) == {"Lc", "Lp"}
+        assert abs(prior["Lc"] - truth[j][0]) < 0.01*truth[j][0]
+        assert abs(prior["Lp"] - truth[j][1]) < 0.1*truth[j][1]
+
+def test_fit_batch_with_priors(params, kBT):
+    truth = [(2000, 40), (5000, 50)]
+    datasets = [wlc_curve(*truth[j % 2], seed=j, kBT=kBT) for j in range(6)]
+
+    df_batch = wlc.fitting.fit_batch(datasets, params, model="WLC", n_workers=2, k=2)
+    df_plain = wlc.fitting.fit_batch(datasets, params, model="WLC", n_workers=2)
+
+    assert list(df_batch['filename']) == [filename for _, _, filename in datasets]
+    np.testing.assert_allclose(df_batch['opt_Lp[nm]'].astype(float), df_plain['opt_Lp[nm]'].astype(float), atol=10*params["min_delta"])
@@ -1,12 +1,41 @@
 import wlc.models
+import wlc.jacobians
+
+import contextlib
+import math
+from concurrent.futures import ProcessPoolExecutor
 
 import lmfit
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
-import matplotlib.pyplot as plt
+import scipy.cluster.vq
+import scipy.optimize
+
+# Plotting style is set on first use of matplotlib
+_STYLE_SET = False
+
+def _pyplot():
+    """Import matplotlib.pyplot lazily and set the plotting style once."""
+    global _STYLE_SET
+    import matplotlib.pyplot as plt
+    if not _STYLE_SET:
+        plt.style.use('ggplot')
+        _STYLE_SET = True
+    return plt
 
-plt.style.use('ggplot')
+# Model function, residual kernel, analytic Jacobian and fitted parameters of each fitting model
+_MODELS = {"WLC" : (wlc.models.WLC, wlc.models._wlc_residual, wlc.jacobians.WLC, ('Lc', 'Lp')),
+           "bouchiat" : (wlc.models.bouchiat, wlc.models._bouchiat_residual, wlc.jacobians.bouchiat, ('Lc', 'Lp')),
+           "odijk" : (wlc.models.odijk, wlc.models._odijk_residual, wlc.jacobians.odijk, ('Lc', 'Lp', 'S')),
+           "extWLC" : (wlc.models.extWLC, wlc.models._extwlc_residual, wlc.jacobians.extWLC, ('Lc', 'Lp', 'S')),
+           "extbouchiat" : (wlc.models.extbouchiat, wlc.models._extbouchiat_residual, wlc.jacobians.extbouchiat, ('Lc', 'Lp', 'S'))}
+
+# Residual and Jacobian kernels batched over many FD curves, used by fit_many
+_BATCHED = {"WLC" : (wlc.models._wlc_residual_batch, wlc.jacobians._WLC_batch),
+            "bouchiat" : (wlc.models._bouchiat_residual_batch, wlc.jacobians._bouchiat_batch),
+            "odijk" : (wlc.models._odijk_residual_batch, wlc.jacobians._odijk_batch),
+            "extWLC" : (wlc.models._extwlc_residual_batch, wlc.jacobians._extWLC_batch),
+            "extbouchiat" : (wlc.models._extbouchiat_residual_batch, wlc.jacobians._extbouchiat_batch)}
 
 class WormLikeChain:
     def __init__(self, model : str = "odijk") -> None:
@@ -18,23 +47,10 @@ class WormLikeChain:
             Worm-like chain model for fitting. Options are: 'WLC', 'bouchiat', and 'odijk'.
         """
         # Store model functions
-        if model == "WLC":
-            self.func = wlc.models.WLC
-        elif model == "bouchiat":
-            self.func = wlc.models.bouchiat
-        elif model == "odijk":
-            self.func = wlc.models.odijk
-        elif model == "extWLC":
-            self.func = wlc.models.extWLC
-            self.resfunc = wlc.models.res_extWLC
-        elif model == "extbouchiat":
-            self.func = wlc.models.extbouchiat
-            self.resfunc = wlc.models.res_extbouchiat
-        else:
+        if model not in _MODELS:
             raise ValueError("Unknown fitting model. Available models are: 'WLC', 'extWLC', 'bouchiat', 'extbouchiat' and 'odijk'.")
-        
-        # Create fitting model
-        self.fmodel = lmfit.Model(self.func)
+        self.func, self._residual, self.jac, names = _MODELS[model]
+        self._names = list(names)
         self.model = model
 
     def __repr__(self):
@@ -53,28 +69,98 @@ class WormLikeChain:
         # Store general parameters
         KB = 0.013806 # Boltzmann constant in pN*nm*K-1
         if ("kBT" in params) & ("T" not in params): 
-            self.fmodel.set_param_hint('kBT', value=params["kBT"])
+            self.kBT = params["kBT"]
         elif ("kBT" not in params) & ("T" in params):
-            self.fmodel.set_param_hint('kBT', value=KB*(273.15 + params["T"]))
+            self.kBT = KB*(273.15 + params["T"])
         else:
             if params["kBT"] == KB*(273.15 + params["T"]):
-                self.fmodel.set_param_hint('kBT', value=params["kBT"])
+                self.kBT = params["kBT"]
             else:
                 raise ValueError("Please provide either T or kBT. They are contradictory")
         
-        # Store DNA parameters
-        self.fmodel.set_param_hint('Lc', value=params['Lc'], min=params['Lc_lower'], max=params['Lc_upper'])
-        self.fmodel.set_param_hint('Lp', value=params['Lp'], min=params['Lp_lower'], max=params['Lp_upper'])
-        if (self.model == "odijk") or (self.model == "extWLC") or (self.model == "extbouchiat"):
-            self.fmodel.set_param_hint('S', value=params['S'], min=params['S_lower'], max=params['S_upper'])
+        # Store DNA parameters: initial values and bounds
+        self._x0 = np.array([params[name] for name in self._names], dtype=np.float64)
+        self._lb = np.array([params[name + '_lower'] for name in self._names], dtype=np.float64)
+        self._ub = np.array([params[name + '_upper'] for name in self._names], dtype=np.float64)
 
-        # Create parameters
-        self.fparams = self.fmodel.make_params()
-
-        # keep kBT constant
-        self.fparams['kBT'].vary = False
+        # Create parameters to report results (kBT is kept constant)
+        self.fparams = lmfit.Parameters()
+        self.fparams.add('kBT', value=self.kBT, vary=False)
+        for name, value, lower, upper in zip(self._names, self._x0, self._lb, self._ub):
+            self.fparams.add(name, value=value, min=lower, max=upper)
     
-    def fit(self, data : tuple, min_delta : float, max_iters : int, filename : str = None, method : str = "leastsq" , verbose : bool = False) -> pd.DataFrame:
+    def _problem(self, d : np.ndarray, F : np.ndarray, dtype : type = np.float64) -> tuple:
+        """Residual (model - observations) and analytic Jacobian of one FD curve.
+
+        The data are cast once to dtype (np.float32 or np.float64), and the model and its
+        Jacobian are evaluated in that precision. Parameters are always float64.
+
+        Outputs
+        -------
+        target : array-like
+            Observations compared to the model: distance [um] for 'odijk', force [pN] otherwise.
+        residual, jacobian : callable
+            Functions of the fitted parameters (Lc, Lp[, S]).
+        """
+        dtype = np.dtype(dtype).type
+        d = np.ascontiguousarray(d, dtype=dtype).ravel()
+        F = np.ascontiguousarray(F, dtype=dtype).ravel()
+
+        # Transform units once: [um] to [nm]
+        d_nm = d*dtype(wlc.models._UM_TO_NM)
+
+        # Scalars in the same precision as the data, so that numba does not promote to float64
+        kBT = dtype(self.kBT)
+        jac_shape = (len(d), len(self._names))
+        if self.model == "odijk":
+            x, target = F, d
+            def jacobian(theta):
+                return self.jac(F, kBT, *theta.astype(dtype), np.empty(jac_shape, dtype=dtype))
+        elif (self.model == "extWLC") or (self.model == "extbouchiat"):
+            x, target = d_nm, F
+            def jacobian(theta):
+                return self.jac(d_nm, F, kBT, *theta.astype(dtype), np.empty(jac_shape, dtype=dtype))
+        else:
+            x, target = d_nm, F
+            def jacobian(theta):
+                return self.jac(d_nm, kBT, *theta.astype(dtype), np.empty(jac_shape, dtype=dtype))
+
+        def residual(theta):
+            return self._residual(theta, x, target, self.kBT)
+
+        return target, residual, jacobian
+
+    def _at_bounds(self, theta : np.ndarray) -> np.ndarray:
+        """Whether the fitted Lc and Lp (the first two columns of theta) are pinned at their bounds.
+
+        Bounded solvers keep the parameters strictly inside the bounds, so values within 1e-6 of the
+        bound range from a bound also count as at that bound. Returns one flag per Lc and Lp.
+        """
+        theta = np.asarray(theta, dtype=np.float64)[..., :2]
+        lower, upper = self._lb[:2], self._ub[:2]
+        width = upper - lower
+        tol = np.where(np.isfinite(width), 1e-6*width, 0.0)
+        return (theta <= lower + tol) | (theta >= upper - tol)
+
+    def _odijk_lstsq(self, d : np.ndarray, F : np.ndarray) -> np.ndarray:
+        """Closed-form least-squares solution of the Odijk model.
+
+        The Odijk model is linear in beta = (Lc, Lc*sqrt(kBT/Lp), Lc/S), so the optimal (Lc, Lp, S)
+        follow from a single linear solve. Returns None if the solution is not within bounds.
+        """
+        d = np.asarray(d, dtype=np.float64)
+        F = np.asarray(F, dtype=np.float64)
+        A = np.column_stack([np.ones_like(F), -0.5/np.sqrt(F), F])
+        beta = np.linalg.lstsq(A, d*wlc.models._UM_TO_NM, rcond=None)[0]
+        if np.any(beta <= 0):
+            return None
+
+        theta = np.array([beta[0], self.kBT*(beta[0]/beta[1])**2, beta[0]/beta[2]])
+        if np.all((theta > self._lb) & (theta < self._ub)):
+            return theta
+        return None
+
+    def fit(self, data : tuple, min_delta : float, max_iters : int, filename : str = None, method : str = "trf" , verbose : bool = False, legacy_leastsq : bool = False, ftol : float = 1e-8, xtol : float = 1e-8, gtol : float = 1e-8, dtype : type = np.float64) -> pd.DataFrame:
         """Worm-Like Chain Molecule fitting from Force-Extension Measurements.
         
         Parameters
@@ -86,82 +172,281 @@ class WormLikeChain:
         max_iters : int
             Stop fitting when reach max_iters
         method : str
-            Name of minimization method to use (default is "leastsq").
+            Name of scipy.optimize.least_squares method to use (default is "trf"). The former lmfit
+            names are accepted: "leastsq" (and "lm") is the same as legacy_leastsq=True and "least_squares" is "trf".
         filename : str
             Name of the file conatining the data. It corresponds to plot title.
         verbose : bool
             If True, a progress bar shows the progress
+        legacy_leastsq : bool
+            If True, use MINPACK's unbounded Levenberg-Marquardt ("lm") instead of method. Out-of-bounds results are filtered out.
+        ftol, xtol, gtol : float
+            Tolerances of the inner solver, see scipy.optimize.least_squares (defaults are scipy's). Except
+            for legacy_leastsq, ftol and xtol are loosened (up to 100 times) while the last increment in Lp
+            is large compared to min_delta.
+        dtype : type
+            Precision of the data during fitting, np.float64 (default) or np.float32. Single precision
+            halves the memory traffic on long FD curves and is well below the noise of the measurements.
+            Fitted parameters and reported results are float64 in both cases.
 
         Outputs
         -------
         df_file : pd.DataFrame
-            Optimal results after fitting.
+            Optimal results after fitting (no rows if every iteration was filtered out).
         """
         # Save data
         d, F = data
 
-        # Empty dataframe to store results.
-        df_full = pd.DataFrame(columns =['Lc[nm]', 'Lp[nm]','S[pN]', 'Chisqr', 'filename', 'iter', 'dLp[nm]'])
+        # Residual as model - observations, and its analytic Jacobian
+        target, residual, analytic_jac = self._problem(d, F, dtype)
+
+        # Odijk: start from the closed-form optimum, so the solver only has to confirm it
+        if self.model == "odijk":
+            theta = self._odijk_lstsq(d, F)
+            if theta is not None:
+                self._x0 = theta
+
+        # Former lmfit method names
+        if method in ("leastsq", "lm"):
+            legacy_leastsq = True
+        elif method == "least_squares":
+            method = "trf"
+        elif method not in ("trf", "dogbox", "lm"):
+            raise ValueError(f"Unknown fitting method '{method}'. Available methods are scipy.optimize.least_squares' 'trf', 'dogbox' and 'lm', or lmfit's 'leastsq' and 'least_squares'.")
+
+        # Solver options: native box bounds, or unbounded Levenberg-Marquardt
+        if legacy_leastsq:
+            solver_kws = {'method' : 'lm'}
+        else:
+            solver_kws = {'method' : method, 'bounds' : (self._lb, self._ub)}
+
+        # Each pass starts where the previous one stopped, so the last Jacobian is reused there
+        J_last, theta_last = None, None
+        def jacobian(theta):
+            nonlocal J_last, theta_last
+            if (J_last is None) or not np.array_equal(theta, theta_last):
+                J_last, theta_last = analytic_jac(theta), theta.copy()
+            return J_last
+
+        # Accepted results per iteration; the dataframe is built once after fitting.
+        rows = []
 
         # Stopping parameters
-        dLp = np.infty
+        dLp = math.inf
         i = 0
 
+        # Progress bar only when verbose
+        if verbose:
+            from tqdm import tqdm
+            progress = tqdm(total=max_iters, mininterval=0.5)
+        else:
+            progress = contextlib.nullcontext()
+
         # Start fitting
-        with tqdm(total=max_iters, disable = not verbose) as pbar:
+        with progress as pbar:
             while (dLp > min_delta) and (i < max_iters):
-                # Fit the model
-                if self.model == "odijk":
-                    self.result = self.fmodel.fit(d, self.fparams, F=F, method=method)
-                    Lc, Lp, S, Chisqr = self.result.params['Lc'].value, self.result.params['Lp'].value, self.result.params['S'].value, self.result.chisqr
-                elif (self.model == "extWLC") or (self.model == "extbouchiat"):
-                    self.result = lmfit.minimize(self.resfunc, self.fparams, args=(F, d), method=method)
-                    Lc, Lp, S, Chisqr = self.result.params['Lc'].value, self.result.params['Lp'].value, self.result.params['S'].value, self.result.chisqr                   
+                # Looser tolerances while the last increment in Lp is large (never for MINPACK,
+                # which would stop at the starting point)
+                if legacy_leastsq or math.isinf(dLp):
+                    coarse = 1.0
                 else:
-                    self.result = self.fmodel.fit(F, self.fparams, d=d, method=method)
-                    Lc, Lp, S, Chisqr = self.result.params['Lc'].value, self.result.params['Lp'].value, None, self.result.chisqr
+                    coarse = min(max(dLp/min_delta, 1.0), 100.0)
+
+                # Fit the model, warm-started from the previous solution
+                self.result = scipy.optimize.least_squares(residual, self._x0, jac=jacobian, x_scale='jac', ftol=coarse*ftol, xtol=coarse*xtol, gtol=gtol, **solver_kws)
+                Lc, Lp = self.result.x[:2]
+                S = self.result.x[2] if len(self._names) == 3 else None
+                Chisqr = 2*float(self.result.cost)
 
                 # Check convercence
-                if i > 0:
-                    dLp = np.abs(Lp-df_full.loc[i-1, 'Lp[nm]'])
-
-                df_res = pd.DataFrame({'Lc[nm]' : [Lc],
-                                        'Lp[nm]' : [Lp],
-                                        'S[pN]' : [S],
-                                        'Chisqr' : [Chisqr],
-                                        'filename' : [filename],
-                                        'iter' : [i + 1],
-                                        'dLp[nm]' : [dLp]})
-                
-                if (Lc <= self.fparams["Lc"].min) | (Lc >= self.fparams["Lc"].max):
+                if rows:
+                    dLp = abs(Lp-rows[-1]['Lp[nm]'])
+
+                # Store results only when within filtering bounds
+                Lc_at_bounds, Lp_at_bounds = self._at_bounds(self.result.x)
+                if Lc_at_bounds:
                     print(f'Fitted Lc is out of bounds in iter {i}, data filtered out')
-                elif (Lp <= self.fparams["Lp"].min) | (Lp >= self.fparams["Lp"].max):
+                elif Lp_at_bounds:
                     print('Fitted Lp is out of bounds, data filtered out')
                 else:
-                    # print('Final Lc, Lp, S values within filtering bounds')
-                    df_full = pd.concat((df_full, df_res), ignore_index=True)
+                    rows.append({'Lc[nm]' : Lc,
+                                 'Lp[nm]' : Lp,
+                                 'S[pN]' : S,
+                                 'Chisqr' : Chisqr,
+                                 'filename' : filename,
+                                 'iter' : i + 1,
+                                 'dLp[nm]' : dLp})
 
                 # Update Lp, Lc, S (conditional) and iter
-                self.fparams["Lp"].set(Lp)
-                self.fparams["Lc"].set(Lc)
-                if (self.model == "odijk") or (self.model == "extWLC") or (self.model == "extbouchiat"):
-                    self.fparams["S"].set(S)
+                self._x0 = self.result.x
                 i += 1
 
                 # Update the progress bar
-                pbar.update(1)
+                if verbose:
+                    pbar.update(1)
 
             # Complete the progress bar
-            pbar.update(max_iters-i)
+            if verbose:
+                pbar.update(max_iters-i)
+
+            # Fitted values and standard errors from the Jacobian at the solution
+            J = np.asarray(self.result.jac, dtype=np.float64)
+            cov = np.linalg.pinv(J.T @ J)*Chisqr/max(len(target) - len(self._names), 1)
+            for name, value, err in zip(self._names, self.result.x, np.sqrt(np.diag(cov))):
+                self.fparams[name].set(value)
+                self.fparams[name].stderr = err
+
+            # Expose results with the same attributes as lmfit
+            self.result.params = self.fparams
+            self.result.residual = self.result.fun
+            self.result.best_fit = target + self.result.fun
+            self.result.chisqr = Chisqr
 
-            # Save fitted values per file
-            df_file = pd.DataFrame([df_full[['Lc[nm]', 'Lp[nm]', 'S[pN]', 'iter', 'filename']].values[-1]], columns=['opt_Lc[nm]', 'opt_Lp[nm]', 'opt_S[pN]', 'nFittings', 'filename'])
+            # Fitting progress
+            df_full = pd.DataFrame(rows, columns=['Lc[nm]', 'Lp[nm]','S[pN]', 'Chisqr', 'filename', 'iter', 'dLp[nm]'])
+
+            # Save fitted values per file (none when every iteration was filtered out)
+            df_file = pd.DataFrame(list(df_full[['Lc[nm]', 'Lp[nm]', 'S[pN]', 'iter', 'filename']].values[-1:]), columns=['opt_Lc[nm]', 'opt_Lp[nm]', 'opt_S[pN]', 'nFittings', 'filename'])
 
             # Save fitting progress as attribute
             self.df_full = df_full
                 
             return df_file
         
+    def fit_many(self, dlist : list, Flist : list, filenames : list = None, max_iters : int = 200, ftol : float = 1e-10) -> pd.DataFrame:
+        """Fit many FD curves at once with a Levenberg-Marquardt solver vectorized across curves.
+
+        All curves start from the compiled initial values. Curves of different lengths are padded
+        and the padding is masked out of the residuals. Steps are projected onto the bounds.
+
+        Parameters
+        ----------
+        dlist : list
+            Observations of distance [um], one array per FD curve.
+        Flist : list
+            Observations of force [pN], one array per FD curve.
+        filenames : list
+            Names of the files containing the data.
+        max_iters : int
+            Maximum number of Levenberg-Marquardt iterations.
+        ftol : float
+            Stop fitting a curve when the relative decrease of its chi-square is lower than ftol.
+
+        Outputs
+        -------
+        df_many : pd.DataFrame
+            Optimal results after fitting, one row per FD curve. Curves with Lc or Lp at their bounds
+            are filtered out (NaN), and 'converged' is False for curves that reached max_iters.
+        """
+        K = len(dlist)
+        N = max(len(d) for d in dlist)
+        p = len(self._names)
+        filenames = list(filenames) if filenames is not None else [None]*K
+
+        # Stack curves into (K, N) arrays, padded with their last observation
+        D, Fs, mask = np.empty((K, N)), np.empty((K, N)), np.zeros((K, N))
+        for k, (d, F) in enumerate(zip(dlist, Flist)):
+            n = len(d)
+            D[k, :n], D[k, n:] = d, d[-1]
+            Fs[k, :n], Fs[k, n:] = F, F[-1]
+            mask[k, :n] = 1.0
+
+        # Residuals and Jacobians of the selected curves, evaluated in a single call each
+        residual_batch, jacobian_batch = _BATCHED[self.model]
+        if self.model == "odijk":
+            x, target = Fs, D
+        else:
+            x, target = D*wlc.models._UM_TO_NM, Fs
+
+        def residuals(theta, rows):
+            return np.where(mask[rows], residual_batch(theta, x, target, self.kBT, rows), 0.0)
+
+        def jacobians(theta, rows):
+            return np.where(mask[rows, :, None], jacobian_batch(theta, x, target, self.kBT, rows), 0.0)
+
+        # Feasible box: the bounds are open, as in fit
+        lower = np.nextafter(self._lb, self._ub)
+        upper = np.nextafter(self._ub, self._lb)
+
+        # Initial state for all curves (closed-form optimum for Odijk when within bounds)
+        theta = np.tile(np.clip(self._x0, lower, upper), (K, 1))
+        if self.model == "odijk":
+            for k, (d, F) in enumerate(zip(dlist, Flist)):
+                theta_k = self._odijk_lstsq(d, F)
+                if theta_k is not None:
+                    theta[k] = theta_k
+        rows = np.arange(K)
+        r = residuals(theta, rows)
+        J = jacobians(theta, rows)
+        cost = np.sum(r*r, axis=1)
+        lam = np.full(K, 1e-3)
+        active = np.ones(K, dtype=bool)
+        converged = np.zeros(K, dtype=bool)
+
+        diag = np.arange(p)
+        for _ in range(max_iters):
+            rows = np.flatnonzero(active)
+
+            # Damped normal equations of the curves still being fitted, solved in a single call
+            A = np.einsum('kni,knj->kij', J[rows], J[rows])
+            g = np.einsum('kni,kn->ki', J[rows], r[rows])
+            A[:, diag, diag] += (lam[rows]*np.trace(A, axis1=1, axis2=2)/p)[:, None]
+
+            # Parameters at a bound that the gradient pushes outwards are kept fixed
+            fixed = ((theta[rows] <= lower) & (g > 0)) | ((theta[rows] >= upper) & (g < 0))
+            free = ~fixed
+            A = A*free[:, :, None]*free[:, None, :]
+            A[:, diag, diag] += fixed
+            g = g*free
+            step = -np.linalg.solve(A, g[:, :, None])[:, :, 0]
+
+            # At most 20% change per parameter and step, so that no step jumps over the pole of the models
+            rel_step = np.max(np.abs(step/theta[rows]), axis=1)
+            step *= (0.2/np.maximum(rel_step, 0.2))[:, None]
+
+            # Trial parameters projected onto the bounds, so parameters not at a bound keep moving
+            theta_new = theta.copy()
+            theta_new[rows] = np.clip(theta[rows] + step, lower, upper)
+            r_new = residuals(theta_new, rows)
+            cost_new = np.sum(r_new*r_new, axis=1)
+
+            # Accept improving steps and update damping
+            accept = cost_new < cost[rows]
+            done = accept & (cost[rows] - cost_new <= ftol*cost[rows])
+            accepted = rows[accept]
+            theta[accepted] = theta_new[accepted]
+            r[accepted] = r_new[accept]
+            cost[accepted] = cost_new[accept]
+            if accepted.size:
+                J[accepted] = jacobians(theta, accepted)
+            lam[rows] = np.where(accept, lam[rows]/10, lam[rows]*10)
+
+            # Curves stop on a small relative decrease, or when no step improves them any more
+            converged[rows[done]] = True
+            active[rows[done]] = False
+            stalled = lam > 1e10
+            converged[active & stalled] = True
+            active &= ~stalled
+            if not active.any():
+                break
+
+        # Store results only when within filtering bounds, as in fit
+        at_bounds = self._at_bounds(theta).any(axis=1)
+        for k in np.flatnonzero(at_bounds):
+            print(f'Fitted Lc or Lp of curve {k if filenames[k] is None else filenames[k]} is at its bounds, data filtered out')
+        for k in np.flatnonzero(~converged):
+            print(f'Curve {k if filenames[k] is None else filenames[k]} did not converge in {max_iters} iterations')
+        theta[at_bounds] = np.nan
+
+        df_many = pd.DataFrame({'opt_Lc[nm]' : theta[:, 0],
+                                'opt_Lp[nm]' : theta[:, 1],
+                                'opt_S[pN]' : theta[:, 2] if p == 3 else [None]*K,
+                                'Chisqr' : cost,
+                                'converged' : converged,
+                                'filename' : filenames})
+
+        return df_many
+
     def plot(self, data : tuple, filename : str = None):
         """Plot fitting results compare to observations.
         
@@ -174,6 +459,7 @@ class WormLikeChain:
         d, F = data
 
         # Create figure
+        plt = _pyplot()
         fig, ax = plt.subplots(figsize=(10, 7.5), dpi=300)
 
         if filename is not None:
@@ -216,6 +502,7 @@ class WormLikeChain:
         d, F = data
 
         # Create figure
+        plt = _pyplot()
         fig, axs = plt.subplots(1, 2, figsize=(7.5, 5), width_ratios=(4, 1), sharey = True, dpi=300)
 
         # Set labels
@@ -230,4 +517,119 @@ class WormLikeChain:
         
         axs[1].hist(self.result.residual, orientation="horizontal")
         axs[1].set_xlabel("counts")
-        plt.show()
\ No newline at end of file
+        plt.show()
+
+def _fit_one(d : np.ndarray, F : np.ndarray, params : dict, model : str, filename : str) -> pd.DataFrame:
+    """Fit a single FD curve with a fresh model (executed in a worker process)."""
+    wlchain = WormLikeChain(model=model)
+    wlchain.compile(params)
+    return wlchain.fit((d, F), min_delta=params["min_delta"], max_iters=params["max_iters"], filename=filename, verbose=False)
+
+def precluster_and_prior(datasets : list, params : dict, model : str = "odijk", k : int = 8, seed : int = 0) -> tuple:
+    """Initial values for batch fits from k-means clusters of similar FD curves.
+
+    Each FD curve is described by its maximum distance, its maximum force and a rough contour
+    length (the WLC high-force limit at the maximum force, with the initial Lp). Curves are grouped
+    with k-means on the standardized features, and the curve closest to each centroid is fitted once,
+    starting from the median rough contour length of its cluster.
+
+    Parameters
+    ----------
+    datasets : list
+        Tuples of distance [um], force [pN] and filename, one per FD curve.
+    params : dict
+        Dictionary with initial values and bounds for model parameters, min_delta and max_iters.
+    model : str
+        Worm-like chain model for fitting. Options are: 'WLC', 'extWLC', 'bouchiat', 'extbouchiat' and 'odijk'.
+    k : int
+        Number of clusters (at most the number of FD curves).
+    seed : int
+        Seed of the k-means initialization.
+
+    Outputs
+    -------
+    labels : np.ndarray
+        Cluster id of each FD curve.
+    priors : dict
+        Fitted parameters of each cluster, {cluster_id : {'Lc' : ..., 'Lp' : ...[, 'S' : ...]}}.
+        Clusters whose representative curve could not be fitted within bounds, or whose fit is pinned
+        against the bounds, are left out.
+    """
+    wlchain = WormLikeChain(model=model)
+    wlchain.compile(params)
+
+    # Features per curve: d_max [nm], F_max [pN] and rough Lc [nm]
+    d_max = np.array([np.max(d) for d, F, _ in datasets], dtype=np.float64)*wlc.models._UM_TO_NM
+    F_max = np.array([np.max(F) for d, F, _ in datasets], dtype=np.float64)
+    Lc_rough = d_max/(1 - 0.5*np.sqrt(wlchain.kBT/(F_max*params["Lp"])))
+    features = np.column_stack([d_max, F_max, Lc_rough])
+
+    # Standardize, so that no feature dominates the distances
+    std = features.std(axis=0)
+    features = (features - features.mean(axis=0))/np.where(std > 0, std, 1.0)
+
+    # Cluster the curves
+    k = min(k, len(datasets))
+    centroids, labels = scipy.cluster.vq.kmeans2(features, k, minit='++', seed=seed)
+
+    # Fit the curve closest to each centroid
+    priors = {}
+    for cluster_id in np.unique(labels):
+        members = np.flatnonzero(labels == cluster_id)
+        closest = members[np.argmin(np.sum((features[members] - centroids[cluster_id])**2, axis=1))]
+        d, F, filename = datasets[closest]
+
+        # Start from the rough contour length of the cluster, strictly within the Lc bounds
+        Lc0 = np.clip(np.median(Lc_rough[members]), np.nextafter(wlchain._lb[0], wlchain._ub[0]), np.nextafter(wlchain._ub[0], wlchain._lb[0]))
+        wlchain.compile({**params, "Lc" : float(Lc0)})
+        wlchain.fit((d, F), min_delta=params["min_delta"], max_iters=params["max_iters"], filename=filename)
+
+        # Last accepted iteration, as reported by fit; no prior if all were out of bounds
+        if wlchain.df_full.empty:
+            continue
+        best = wlchain.df_full[['Lc[nm]', 'Lp[nm]', 'S[pN]']].values[-1, :len(wlchain._names)].astype(np.float64)
+
+        # A fit pinned against its bounds is no better a start than the initial values
+        if wlchain._at_bounds(best).any():
+            continue
+        priors[int(cluster_id)] = dict(zip(wlchain._names, best.tolist()))
+
+    return labels, priors
+
+def fit_batch(datasets : list, params : dict, model : str = "odijk", n_workers : int = None, k : int = None) -> pd.DataFrame:
+    """Fit many independent FD curves in parallel worker processes.
+
+    Parameters
+    ----------
+    datasets : list
+        Tuples of distance [um], force [pN] and filename, one per FD curve.
+    params : dict
+        Dictionary with initial values and bounds for model parameters, min_delta and max_iters.
+    model : str
+        Worm-like chain model for fitting. Options are: 'WLC', 'extWLC', 'bouchiat', 'extbouchiat' and 'odijk'.
+    n_workers : int
+        Number of worker processes (default is the number of CPUs).
+    k : int
+        If given, FD curves are first grouped in k clusters and each curve starts from the fit of
+        its cluster representative, see precluster_and_prior. Default is to start from params.
+
+    Outputs
+    -------
+    df_batch : pd.DataFrame
+        Optimal results after fitting, one row per FD curve.
+    """
+    d, F, filenames = zip(*datasets)
+    n = len(datasets)
+
+    # Initial values per curve
+    if k is None:
+        curve_params = [params]*n
+    else:
+        labels, priors = precluster_and_prior(datasets, params, model=model, k=k)
+        curve_params = [{**params, **priors.get(int(label), {})} for label in labels]
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        results = executor.map(_fit_one, d, F, curve_params, [model]*n, filenames)
+        df_batch = pd.concat(list(results), ignore_index=True)
+
+    return df_batch
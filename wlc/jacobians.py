@@ -0,0 +1,123 @@
+"""Analytic Jacobians of the worm-like chain models"""
+import numpy as np
+from numba import njit
+
+from wlc.models import _ALPHA
+
+# Each kernel fills `out` with the derivatives of the model with respect to
+# the fitted parameters (Lc, Lp[, S]), one row per observation. Distances are
+# expected in [nm], as for the model kernels in wlc.models.
+@njit(fastmath=True, cache=True, error_model="numpy")
+def WLC(d_nm, kBT, Lc, Lp, out):
+    """Jacobian of wlc.models.WLC with respect to (Lc, Lp). Units: [pN/nm]"""
+    invLc, invLp = 1.0/Lc, 1.0/Lp
+    scale = kBT*invLp
+    for i in range(d_nm.shape[0]):
+        x = d_nm[i]*invLc
+        omx = 1.0 - x
+        g = 0.25/(omx*omx) - 0.25 + x
+        dg = 0.5/(omx*omx*omx) + 1.0
+        out[i, 0] = -scale*dg*x*invLc
+        out[i, 1] = -scale*g*invLp
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def bouchiat(d_nm, kBT, Lc, Lp, out):
+    """Jacobian of wlc.models.bouchiat with respect to (Lc, Lp). Units: [pN/nm]"""
+    a0, a1, a2, a3, a4, a5 = _ALPHA
+    invLc, invLp = 1.0/Lc, 1.0/Lp
+    scale = kBT*invLp
+    for i in range(d_nm.shape[0]):
+        x = d_nm[i]*invLc
+        omx = 1.0 - x
+        g = 0.25/(omx*omx) - 0.25 + x + x*x*(a0 + x*(a1 + x*(a2 + x*(a3 + x*(a4 + x*a5)))))
+        dg = 0.5/(omx*omx*omx) + 1.0 + x*(2*a0 + x*(3*a1 + x*(4*a2 + x*(5*a3 + x*(6*a4 + x*7*a5)))))
+        out[i, 0] = -scale*dg*x*invLc
+        out[i, 1] = -scale*g*invLp
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def extWLC(d_nm, F, kBT, Lc, Lp, S, out):
+    """Jacobian of wlc.models.extWLC with respect to (Lc, Lp, S). Units: [pN/nm], [pN/nm], [1]"""
+    invLc, invLp, invS = 1.0/Lc, 1.0/Lp, 1.0/S
+    scale = kBT*invLp
+    for i in range(d_nm.shape[0]):
+        x = d_nm[i]*invLc
+        l = x - F[i]*invS
+        oml = 1.0 - l
+        g = 0.25/(oml*oml) - 0.25 + l
+        dg = 0.5/(oml*oml*oml) + 1.0
+        out[i, 0] = -scale*dg*x*invLc
+        out[i, 1] = -scale*g*invLp
+        out[i, 2] = scale*dg*F[i]*invS*invS
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def extbouchiat(d_nm, F, kBT, Lc, Lp, S, out):
+    """Jacobian of wlc.models.extbouchiat with respect to (Lc, Lp, S). Units: [pN/nm], [pN/nm], [1]"""
+    a0, a1, a2, a3, a4, a5 = _ALPHA
+    invLc, invLp, invS = 1.0/Lc, 1.0/Lp, 1.0/S
+    scale = kBT*invLp
+    for i in range(d_nm.shape[0]):
+        x = d_nm[i]*invLc
+        l = x - F[i]*invS
+        oml = 1.0 - l
+        g = 0.25/(oml*oml) - 0.25 + l + l*l*(a0 + l*(a1 + l*(a2 + l*(a3 + l*(a4 + l*a5)))))
+        dg = 0.5/(oml*oml*oml) + 1.0 + l*(2*a0 + l*(3*a1 + l*(4*a2 + l*(5*a3 + l*(6*a4 + l*7*a5)))))
+        out[i, 0] = -scale*dg*x*invLc
+        out[i, 1] = -scale*g*invLp
+        out[i, 2] = scale*dg*F[i]*invS*invS
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def odijk(F, kBT, Lc, Lp, S, out):
+    """Jacobian of wlc.models.odijk with respect to (Lc, Lp, S). Units: [um/nm], [um/nm], [um/pN]"""
+    Lc_um, kBT_Lp, invLp, invS = Lc/1000, kBT/Lp, 1.0/Lp, 1.0/S
+    for i in range(F.shape[0]):
+        sq = (kBT_Lp/F[i])**0.5
+        out[i, 0] = (1.0 - 0.5*sq + F[i]*invS)/1000
+        out[i, 1] = Lc_um*0.25*sq*invLp
+        out[i, 2] = -Lc_um*F[i]*invS*invS
+    return out
+
+# Batched kernels for many FD curves at once, with the arguments of the residual kernels in
+# wlc.models: theta is (K, p), x and y are (K, N), and only the curves listed in `rows` are evaluated.
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _WLC_batch(theta, x, y, kBT, rows):
+    out = np.empty((rows.shape[0], x.shape[1], 2), dtype=x.dtype)
+    for j in range(rows.shape[0]):
+        k = rows[j]
+        WLC(x[k], kBT, theta[k, 0], theta[k, 1], out[j])
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _bouchiat_batch(theta, x, y, kBT, rows):
+    out = np.empty((rows.shape[0], x.shape[1], 2), dtype=x.dtype)
+    for j in range(rows.shape[0]):
+        k = rows[j]
+        bouchiat(x[k], kBT, theta[k, 0], theta[k, 1], out[j])
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _extWLC_batch(theta, x, y, kBT, rows):
+    out = np.empty((rows.shape[0], x.shape[1], 3), dtype=x.dtype)
+    for j in range(rows.shape[0]):
+        k = rows[j]
+        extWLC(x[k], y[k], kBT, theta[k, 0], theta[k, 1], theta[k, 2], out[j])
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _extbouchiat_batch(theta, x, y, kBT, rows):
+    out = np.empty((rows.shape[0], x.shape[1], 3), dtype=x.dtype)
+    for j in range(rows.shape[0]):
+        k = rows[j]
+        extbouchiat(x[k], y[k], kBT, theta[k, 0], theta[k, 1], theta[k, 2], out[j])
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _odijk_batch(theta, x, y, kBT, rows):
+    out = np.empty((rows.shape[0], x.shape[1], 3), dtype=x.dtype)
+    for j in range(rows.shape[0]):
+        k = rows[j]
+        odijk(x[k], kBT, theta[k, 0], theta[k, 1], theta[k, 2], out[j])
+    return out
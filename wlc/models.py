@@ -1,6 +1,163 @@
-"""Worm-like chain models"""
+"""Worm-like chain models
+
+Model parameters (kBT, Lc, Lp, S) are scalars. Observations are broadcast
+against each other and evaluated in float64, shaped as the broadcast input.
+"""
 import lmfit
 import numpy as np
+from numba import njit
+
+# Unit conversion: [um] to [nm]
+_UM_TO_NM = 1000.0
+
+# Bouchiat et al. correction coefficients (alpha_2 ... alpha_7)
+_ALPHA = (-0.5164228, -2.737418, 16.07497, -38.87607, 39.49944, -14.17718)
+
+# Compiled kernels: single pass over contiguous float64 arrays, written into `out`.
+# Distances are expected in [nm].
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _wlc_core(d_nm, kBT, Lc, Lp, out):
+    invLc, scale = 1.0/Lc, kBT/Lp
+    for i in range(d_nm.shape[0]):
+        x = d_nm[i]*invLc
+        omx = 1.0 - x
+        out[i] = scale*(0.25/(omx*omx) - 0.25 + x)
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _bouchiat_core(d_nm, kBT, Lc, Lp, out):
+    a0, a1, a2, a3, a4, a5 = _ALPHA
+    invLc, scale = 1.0/Lc, kBT/Lp
+    for i in range(d_nm.shape[0]):
+        x = d_nm[i]*invLc
+        omx = 1.0 - x
+        out[i] = scale*(0.25/(omx*omx) - 0.25 + x + x*x*(a0 + x*(a1 + x*(a2 + x*(a3 + x*(a4 + x*a5))))))
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _extwlc_core(d_nm, F, kBT, Lc, Lp, S, out):
+    invLc, invS, scale = 1.0/Lc, 1.0/S, kBT/Lp
+    for i in range(d_nm.shape[0]):
+        l = d_nm[i]*invLc - F[i]*invS
+        oml = 1.0 - l
+        out[i] = scale*(0.25/(oml*oml) - 0.25 + l)
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _extbouchiat_core(d_nm, F, kBT, Lc, Lp, S, out):
+    a0, a1, a2, a3, a4, a5 = _ALPHA
+    invLc, invS, scale = 1.0/Lc, 1.0/S, kBT/Lp
+    for i in range(d_nm.shape[0]):
+        l = d_nm[i]*invLc - F[i]*invS
+        oml = 1.0 - l
+        out[i] = scale*(0.25/(oml*oml) - 0.25 + l + l*l*(a0 + l*(a1 + l*(a2 + l*(a3 + l*(a4 + l*a5))))))
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _odijk_core(F, kBT, Lc, Lp, S, out):
+    Lc_um, kBT_Lp, invS = Lc/1000, kBT/Lp, 1.0/S
+    for i in range(F.shape[0]):
+        out[i] = Lc_um*(1.0 - 0.5*(kBT_Lp/F[i])**0.5 + F[i]*invS)
+    return out
+
+# Residual kernels: model(x; theta) - y for theta = (Lc, Lp[, S]). x is the independent variable
+# (distance [nm], or force [pN] for odijk) and y the observations (force [pN], or distance [um] for
+# odijk). theta and kBT are cast to the precision of the data, so float32 data is evaluated in float32.
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _wlc_residual(theta, x, y, kBT):
+    theta, kBT = theta.astype(x.dtype), x.dtype.type(kBT)
+    out = _wlc_core(x, kBT, theta[0], theta[1], np.empty_like(x))
+    for i in range(x.shape[0]):
+        out[i] -= y[i]
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _bouchiat_residual(theta, x, y, kBT):
+    theta, kBT = theta.astype(x.dtype), x.dtype.type(kBT)
+    out = _bouchiat_core(x, kBT, theta[0], theta[1], np.empty_like(x))
+    for i in range(x.shape[0]):
+        out[i] -= y[i]
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _extwlc_residual(theta, x, y, kBT):
+    theta, kBT = theta.astype(x.dtype), x.dtype.type(kBT)
+    out = _extwlc_core(x, y, kBT, theta[0], theta[1], theta[2], np.empty_like(x))
+    for i in range(x.shape[0]):
+        out[i] -= y[i]
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _extbouchiat_residual(theta, x, y, kBT):
+    theta, kBT = theta.astype(x.dtype), x.dtype.type(kBT)
+    out = _extbouchiat_core(x, y, kBT, theta[0], theta[1], theta[2], np.empty_like(x))
+    for i in range(x.shape[0]):
+        out[i] -= y[i]
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _odijk_residual(theta, x, y, kBT):
+    theta, kBT = theta.astype(x.dtype), x.dtype.type(kBT)
+    out = _odijk_core(x, kBT, theta[0], theta[1], theta[2], np.empty_like(x))
+    for i in range(x.shape[0]):
+        out[i] -= y[i]
+    return out
+
+# Batched residual kernels for many FD curves at once: theta is (K, p), x and y are (K, N), and only
+# the curves listed in `rows` are evaluated.
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _wlc_residual_batch(theta, x, y, kBT, rows):
+    out = np.empty((rows.shape[0], x.shape[1]), dtype=x.dtype)
+    for j in range(rows.shape[0]):
+        k = rows[j]
+        out[j] = _wlc_residual(theta[k], x[k], y[k], kBT)
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _bouchiat_residual_batch(theta, x, y, kBT, rows):
+    out = np.empty((rows.shape[0], x.shape[1]), dtype=x.dtype)
+    for j in range(rows.shape[0]):
+        k = rows[j]
+        out[j] = _bouchiat_residual(theta[k], x[k], y[k], kBT)
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _extwlc_residual_batch(theta, x, y, kBT, rows):
+    out = np.empty((rows.shape[0], x.shape[1]), dtype=x.dtype)
+    for j in range(rows.shape[0]):
+        k = rows[j]
+        out[j] = _extwlc_residual(theta[k], x[k], y[k], kBT)
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _extbouchiat_residual_batch(theta, x, y, kBT, rows):
+    out = np.empty((rows.shape[0], x.shape[1]), dtype=x.dtype)
+    for j in range(rows.shape[0]):
+        k = rows[j]
+        out[j] = _extbouchiat_residual(theta[k], x[k], y[k], kBT)
+    return out
+
+@njit(fastmath=True, cache=True, error_model="numpy")
+def _odijk_residual_batch(theta, x, y, kBT, rows):
+    out = np.empty((rows.shape[0], x.shape[1]), dtype=x.dtype)
+    for j in range(rows.shape[0]):
+        k = rows[j]
+        out[j] = _odijk_residual(theta[k], x[k], y[k], kBT)
+    return out
+
+def _as_array(x : np.ndarray) -> np.ndarray:
+    """Flat contiguous float64 view (or copy) of x."""
+    return np.ascontiguousarray(x, dtype=np.float64).ravel()
+
+def _shaped_as(out : np.ndarray, x : np.ndarray) -> np.ndarray:
+    """Kernel output reshaped as the input x (a scalar for scalar x)."""
+    return out.reshape(np.shape(x))[()]
+
+def _scalars(*params : float) -> tuple:
+    """Model parameters as Python floats; the kernels take one value per parameter."""
+    if any(np.ndim(p) != 0 for p in params):
+        raise TypeError('Model parameters (kBT, Lc, Lp, S) must be scalars')
+    return tuple(float(p) for p in params)
 
 def WLC(d : np.ndarray, kBT : float, Lc : float, Lp : float) -> np.ndarray:
     r"""Worm-like chain model.
@@ -30,9 +187,10 @@ def WLC(d : np.ndarray, kBT : float, Lc : float, Lp : float) -> np.ndarray:
     doi: 10.1126/science.8079175. PMID: 8079175.
     """
     # Transform units: [um] to [nm]
-    d = d*1000
-    
-    return (kBT/Lp)*(0.25/(1-d/Lc)**2 - 0.25 + d/Lc)
+    d_nm = _as_array(d)*_UM_TO_NM
+    kBT, Lc, Lp = _scalars(kBT, Lc, Lp)
+
+    return _shaped_as(_wlc_core(d_nm, kBT, Lc, Lp, np.empty_like(d_nm)), d)
 
 def extWLC(fparams : lmfit.Parameters, F : np.ndarray, d : np.ndarray) -> np.ndarray:
     r"""Modified worm-like chain model.
@@ -62,19 +220,20 @@ def extWLC(fparams : lmfit.Parameters, F : np.ndarray, d : np.ndarray) -> np.nda
     Rnr4p, a Novel Ribonucleotide Reductase Small-Subunit Protein, Molecular and Cellular Biology, 17:10, 6114-6121, 
     DOI: 10.1128/MCB.17.10.6114
     """
+    # Distance and force are read element-wise: broadcast them against each other
+    d, F = np.broadcast_arrays(d, F)
     # Transform units: [um] to [nm]
-    d = d*1000
+    d_nm = _as_array(d)*_UM_TO_NM
     # Unpack parameters: extract .value attribute for each parameter
     fparamsvals = fparams.valuesdict()
     kBT = fparamsvals['kBT']
     Lc = fparamsvals['Lc']
     Lp = fparamsvals['Lp']
     S = fparamsvals['S']
+    kBT, Lc, Lp, S = _scalars(kBT, Lc, Lp, S)
+    F = _as_array(F)
 
-    # Compute normalized extension
-    l = d/Lc - F/S
-    
-    return (kBT/Lp)*(0.25/(1-l)**2 - 0.25 + l)
+    return _shaped_as(_extwlc_core(d_nm, F, kBT, Lc, Lp, S, np.empty_like(d_nm)), d)
 
 def res_extWLC(fparams : lmfit.Parameters, F : np.ndarray, d : np.ndarray) -> np.ndarray:
     r"""Modified worm-like chain model.
@@ -104,19 +263,20 @@ def res_extWLC(fparams : lmfit.Parameters, F : np.ndarray, d : np.ndarray) -> np
     Rnr4p, a Novel Ribonucleotide Reductase Small-Subunit Protein, Molecular and Cellular Biology, 17:10, 6114-6121, 
     DOI: 10.1128/MCB.17.10.6114
     """
+    # Distance and force are read element-wise: broadcast them against each other
+    d, F = np.broadcast_arrays(d, F)
     # Transform units: [um] to [nm]
-    d = d*1000
+    d_nm = _as_array(d)*_UM_TO_NM
     # Unpack parameters: extract .value attribute for each parameter
     fparamsvals = fparams.valuesdict()
     kBT = fparamsvals['kBT']
     Lc = fparamsvals['Lc']
     Lp = fparamsvals['Lp']
     S = fparamsvals['S']
+    kBT, Lc, Lp, S = _scalars(kBT, Lc, Lp, S)
+    F = _as_array(F)
 
-    # Compute normalized extension
-    l = d/Lc - F/S
-    
-    return F - (kBT/Lp)*(0.25/(1-l)**2 - 0.25 + l)
+    return _shaped_as(F - _extwlc_core(d_nm, F, kBT, Lc, Lp, S, np.empty_like(d_nm)), d)
 
 def bouchiat(d : np.ndarray, kBT : float, Lc : float, Lp : float) -> np.ndarray:
     r"""Bouchiat et al. worm-like chain model with seventh order correction.
@@ -145,16 +305,10 @@ def bouchiat(d : np.ndarray, kBT : float, Lc : float, Lp : float) -> np.ndarray:
     Biophysical Journal
     """
     # Transform units: [um] to [nm]
-    d = d*1000
-    
-    # Correction coefficients
-    alpha = np.array([-0.5164228, -2.737418, 16.07497, -38.87607, 39.49944, -14.17718])
+    d_nm = _as_array(d)*_UM_TO_NM
+    kBT, Lc, Lp = _scalars(kBT, Lc, Lp)
 
-    # Compute correction
-    corr = 0
-    for n in range(len(alpha)): corr += alpha[n]*(d/Lc)**(n+2) 
-    
-    return (kBT/Lp)*(0.25/(1-d/Lc)**2 - 0.25 + d/Lc + corr)
+    return _shaped_as(_bouchiat_core(d_nm, kBT, Lc, Lp, np.empty_like(d_nm)), d)
 
 def extbouchiat(fparams : lmfit.Parameters, F : np.ndarray, d : np.ndarray) -> np.ndarray:
     r"""Modified Bouchiat et al. worm-like chain model with seventh order correction.
@@ -189,26 +343,20 @@ def extbouchiat(fparams : lmfit.Parameters, F : np.ndarray, d : np.ndarray) -> n
     Estimating the Persistence Length of a Worm-Like Chain Molecule from Force-Extension Measurements
     Biophysical Journal
     """
+    # Distance and force are read element-wise: broadcast them against each other
+    d, F = np.broadcast_arrays(d, F)
     # Transform units: [um] to [nm]
-    d = d*1000
+    d_nm = _as_array(d)*_UM_TO_NM
     # Unpack parameters: extract .value attribute for each parameter
     fparamsvals = fparams.valuesdict()
     kBT = fparamsvals['kBT']
     Lc = fparamsvals['Lc']
     Lp = fparamsvals['Lp']
     S = fparamsvals['S']
+    kBT, Lc, Lp, S = _scalars(kBT, Lc, Lp, S)
+    F = _as_array(F)
 
-    # Compute normalized extension
-    l = d/Lc - F/S
-    
-    # Correction coefficients
-    alpha = np.array([-0.5164228, -2.737418, 16.07497, -38.87607, 39.49944, -14.17718])
-
-    # Compute correction
-    corr = 0
-    for n in range(len(alpha)): corr += alpha[n]*(l)**(n+2) 
-    
-    return (kBT/Lp)*(0.25/(1-l)**2 - 0.25 + l + corr)
+    return _shaped_as(_extbouchiat_core(d_nm, F, kBT, Lc, Lp, S, np.empty_like(d_nm)), d)
 
 def res_extbouchiat(fparams : lmfit.Parameters, F : np.ndarray, d : np.ndarray) -> np.ndarray:
     r"""Modified Bouchiat et al. worm-like chain model with seventh order correction.
@@ -242,26 +390,20 @@ def res_extbouchiat(fparams : lmfit.Parameters, F : np.ndarray, d : np.ndarray)
     Estimating the Persistence Length of a Worm-Like Chain Molecule from Force-Extension Measurements
     Biophysical Journal
     """
+    # Distance and force are read element-wise: broadcast them against each other
+    d, F = np.broadcast_arrays(d, F)
     # Transform units: [um] to [nm]
-    d = d*1000
+    d_nm = _as_array(d)*_UM_TO_NM
     # Unpack parameters: extract .value attribute for each parameter
     fparamsvals = fparams.valuesdict()
     kBT = fparamsvals['kBT']
     Lc = fparamsvals['Lc']
     Lp = fparamsvals['Lp']
     S = fparamsvals['S']
+    kBT, Lc, Lp, S = _scalars(kBT, Lc, Lp, S)
+    F = _as_array(F)
 
-    # Compute normalized extension
-    l = d/Lc - F/S
-    
-    # Correction coefficients
-    alpha = np.array([-0.5164228, -2.737418, 16.07497, -38.87607, 39.49944, -14.17718])
-
-    # Compute correction
-    corr = 0
-    for n in range(len(alpha)): corr += alpha[n]*(l)**(n+2) 
-    
-    return F - (kBT/Lp)*(0.25/(1-l)**2 - 0.25 + l + corr)
+    return _shaped_as(F - _extbouchiat_core(d_nm, F, kBT, Lc, Lp, S, np.empty_like(d_nm)), d)
 
 def odijk(F : np.ndarray, kBT : float, Lc : float, Lp : float, S : float) -> np.ndarray:
     r"""Odidjk worm-like chain model.
@@ -293,4 +435,7 @@ def odijk(F : np.ndarray, kBT : float, Lc : float, Lp : float, S : float) -> np.
     7016-7018 doi: 10.1021/ma00124a044
     """
 
-    return Lc*(1-0.5*(kBT/(F*Lp))**0.5+F/S)/1000
+    F_flat = _as_array(F)
+    kBT, Lc, Lp, S = _scalars(kBT, Lc, Lp, S)
+
+    return _shaped_as(_odijk_core(F_flat, kBT, Lc, Lp, S, np.empty_like(F_flat)), F)